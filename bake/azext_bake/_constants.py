@@ -7,6 +7,7 @@
 import os
 
 from datetime import datetime, timezone
+from functools import lru_cache
 from pathlib import Path
 
 timestamp = datetime.now(timezone.utc).strftime('%Y%m%d%H%M%S')
@@ -82,11 +83,12 @@ PKR_DEFAULT_VARS = {
 }
 
 
+@lru_cache(maxsize=None)
 def tag_key(key):
     return f'{TAG_PREFIX}{key}'
 
 
-DEFAULT_TAGS = {
+DEFAULT_TAGS = frozenset({
     tag_key('cli-version'),
     tag_key('sandbox-version'),
     tag_key('sandbox-prerelease'),
@@ -99,7 +101,7 @@ DEFAULT_TAGS = {
     tag_key('storageAccount'),
     tag_key('subnetId'),
     tag_key('identityId'),
-}
+})
 
 CHOCO_PACKAGES_CONFIG_FILE = 'packages.config'
 CHOCO_PACKAGES_USER_CONFIG_FILE = 'user.packages.config'
@@ -4,34 +4,53 @@
 # ------------------------------------
 # pylint: disable=too-many-instance-attributes
 
-from dataclasses import MISSING, asdict, dataclass, field, fields
+import re
+
+from dataclasses import MISSING, dataclass, field, fields, is_dataclass
+from functools import lru_cache
 from pathlib import Path
 from typing import List, Literal, Optional
 
 from azure.cli.core.azclierror import ValidationError
-from azure.cli.core.util import is_guid
-from azure.mgmt.core.tools import is_valid_resource_id
 
 from ._constants import IMAGE_DEFAULT_BASE_WINDOWS
 
+_CAMEL_RE = re.compile(r'([A-Z])')
+
+_GUID_RE = re.compile(r'\A[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}\Z', re.IGNORECASE)
+_RESOURCE_ID_RE = re.compile(r'\A/subscriptions/[^/]+/resourceGroups/[^/]+/providers/[^/]+(?:/[^/]+/[^/]+)+\Z',
+                             re.IGNORECASE)
 
+
+# keys come from a small fixed set of dataclass fields and yaml properties, so cache the conversions
+@lru_cache(maxsize=4096)
 def _snake_to_camel(name: str):
-    parts = name.split('_')
-    return parts[0] + ''.join(word.title() for word in parts[1:])
+    head, sep, tail = name.partition('_')
+    if not sep:
+        return name
+    return head + ''.join(p[:1].upper() + p[1:] for p in tail.split('_'))
 
 
+@lru_cache(maxsize=4096)
 def _camel_to_snake(name: str):
-    return ''.join(['_' + c.lower() if c.isupper() else c for c in name]).lstrip('_')
+    return _CAMEL_RE.sub(lambda m: '_' + m.group(1).lower(), name).lstrip('_')
+
+
+@lru_cache(maxsize=None)
+def _get_data_fields(data_type: type):
+    '''Returns the allowed (camelCase) keys and the required keys, in field order, for a dataclass type.
+    The fields of a dataclass never change, so this is only computed once per type.'''
+    flds = fields(data_type)
+    all_fields = frozenset(_snake_to_camel(f.name) for f in flds) | {'file', 'dir'}
+    req_fields = tuple(_snake_to_camel(f.name) for f in flds if f.default is MISSING)
+    return all_fields, req_fields
 
 
 def _validate_data_object(data_type: type, obj: dict, path: Path = None, parent_key: str = None):
     '''Validates a dict data object against a dataclass type.
     Ensures all required fields are present and that no invalid fields are present.'''
 
-    flds = fields(data_type)
-    all_fields = [_snake_to_camel(f.name) for f in flds]
-    req_fields = [_snake_to_camel(f.name) for f in flds if f.default is MISSING]
-    # opt_fields = [f.name for f in flds if f.default is not MISSING]
+    all_fields, req_fields = _get_data_fields(data_type)
 
     key_prefix = f'{parent_key}.' if parent_key else ''
 
@@ -43,15 +62,36 @@ def _validate_data_object(data_type: type, obj: dict, path: Path = None, parent_
         if not obj[k]:
             raise ValidationError(f'{name} is missing a value for required property: {key_prefix}{k}')
         # TODO: Validate types
-    for k in obj:
-        if k not in all_fields and k not in ['file', 'dir']:
-            raise ValidationError(f'{name} contains an invalid property: {key_prefix}{k}')
+    if invalid := obj.keys() - all_fields:
+        k = next(k for k in obj if k in invalid)  # report the first invalid property in document order
+        raise ValidationError(f'{name} contains an invalid property: {key_prefix}{k}')
+
+
+@lru_cache(maxsize=None)
+def _get_dict_fields(data_type: type):
+    '''Returns (attribute name, camelCase key) pairs for the fields of a dataclass type'''
+    return tuple((f.name, _snake_to_camel(f.name)) for f in fields(data_type))
+
+
+def _get_dict_value(value):
+    if is_dataclass(value) and not isinstance(value, type):
+        return get_dict(value)
+    if isinstance(value, (list, tuple)):
+        return type(value)(_get_dict_value(v) for v in value)
+    if isinstance(value, dict):
+        return {k: _get_dict_value(v) for k, v in value.items()}
+    return value
+
+
+def _expand_shorthand(item, key: str):
+    '''Expands a string shorthand list item (i.e. - git) into its object form (i.e. {'id': 'git'})'''
+    return {key: item} if isinstance(item, str) else item
 
 
 def get_dict(instance):
     # TODO: shoul we filter False values?  How can we convert back to string lists fo things like choco packages?
-    return asdict(instance, dict_factory=lambda x: {_snake_to_camel(k): v for k,
-                                                    v in x if v is not None and v is not False})
+    return {k: _get_dict_value(v) for a, k in _get_dict_fields(type(instance))
+            if (v := getattr(instance, a)) is not None and v is not False}
 
 
 # --------------------------------
@@ -81,8 +121,7 @@ class ImageInstallScripts:
     def __init__(self, obj: dict, path: Path = None) -> None:
         _validate_data_object(ImageInstallScripts, obj, path=path, parent_key='install.scripts')
 
-        self.powershell = [PowershellScript({'path': s}, path) if isinstance(s, str)
-                           else PowershellScript(s, path) for s in obj['powershell']]
+        self.powershell = [PowershellScript(_expand_shorthand(s, 'path'), path) for s in obj['powershell']]
 
 
 # --------------------------------
@@ -127,16 +166,17 @@ class ChocoPackage:
         self.user = obj.get('user', False)
         self.restart = obj.get('restart', False)
 
-    @property
-    def id_only(self):
-        return self.source is None and self.version is None and self.install_arguments is None \
+        # only the id was given (restart doesn't count), fields only change in apply_defaults
+        self.id_only = self.source is None and self.version is None and self.install_arguments is None \
             and self.package_parameters is None and not self.user
 
     def apply_defaults(self, defaults: ChocoDefaults):
         if defaults.source is not None and self.source is None:
             self.source = defaults.source
+            self.id_only = False
         if defaults.install_arguments is not None and self.install_arguments is None:
             self.install_arguments = defaults.install_arguments
+            self.id_only = False
 
 
 @dataclass
@@ -149,8 +189,7 @@ class ImageInstallChoco:
     def __init__(self, obj: dict, path: Path = None) -> None:
         _validate_data_object(ImageInstallChoco, obj, path=path, parent_key='install.choco')
 
-        self.packages = [ChocoPackage({'id': p}, path) if isinstance(p, str)
-                         else ChocoPackage(p, path) for p in obj['packages']]
+        self.packages = [ChocoPackage(_expand_shorthand(p, 'id'), path) for p in obj['packages']]
 
 
 # --------------------------------
@@ -207,8 +246,7 @@ class ImageInstallWinget:
     def __init__(self, obj: dict, path: Path = None) -> None:
         _validate_data_object(ImageInstallWinget, obj, path=path, parent_key='install.winget')
 
-        self.packages = [WingetPackage({'any': p}, path) if isinstance(p, str)
-                         else WingetPackage(p, path) for p in obj['packages']]
+        self.packages = [WingetPackage(_expand_shorthand(p, 'any'), path) for p in obj['packages']]
         self.defaults = WingetDefaults(obj['defaults'], path) if 'defaults' in obj else None
 
 
@@ -266,6 +304,10 @@ class ImageBase:
         self.version = obj.get('version', 'latest')
 
 
+# shared by every windows image that doesn't specify a base, so it must not be modified
+DEFAULT_WINDOWS_IMAGE_BASE = ImageBase(IMAGE_DEFAULT_BASE_WINDOWS)
+
+
 @dataclass
 class ImagePlan:
     # required
@@ -322,7 +364,7 @@ class Image:
         if 'base' in obj:
             self.base = ImageBase(obj['base'], path)
         elif self.os.lower() == 'windows':
-            self.base = ImageBase(IMAGE_DEFAULT_BASE_WINDOWS, path)
+            self.base = DEFAULT_WINDOWS_IMAGE_BASE
         else:
             raise ValidationError('Image base is required for non-Windows images')
 
@@ -376,10 +418,10 @@ class Sandbox:
         self.identity_id = obj['identityId']
         self.location = obj.get('location')
 
-        if not is_guid(self.subscription):
+        if not _GUID_RE.match(self.subscription):
             raise ValidationError('sandbox.subscription is not a valid GUID')
 
-        if not is_valid_resource_id(self.identity_id):
+        if not _RESOURCE_ID_RE.match(self.identity_id):
             raise ValidationError('sandbox.identityId is not a valid resource ID')
 
 
@@ -404,7 +446,7 @@ class Gallery:
         self.resource_group = obj['resourceGroup']
         self.subscription = obj.get('subscription')
 
-        if self.subscription and not is_guid(self.subscription):
+        if self.subscription and not _GUID_RE.match(self.subscription):
             raise ValidationError('gallery.subscription is not a valid GUID')
 
 
@@ -4,28 +4,109 @@
 # ------------------------------------
 # pylint: disable=logging-fstring-interpolation, too-many-statements, too-many-locals, too-many-lines
 
+import json
+import time
+
+from functools import lru_cache
+from pathlib import Path
+
 import requests
 
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from azure.cli.core._environment import get_config_dir
 from azure.cli.core.azclierror import ClientRequestError, MutuallyExclusiveArgumentError, ResourceNotFoundError
 from azure.cli.core.util import should_disable_connection_verify
 
 from ._utils import get_logger
 
+try:
+    from orjson import loads as json_loads  # pylint: disable=no-name-in-module
+except ImportError:
+    from json import loads as json_loads
+
 ERR_TMPL_PRDR_TEMPLATES = 'Unable to get templates.\n'
 ERR_TMPL_NON_200 = f'{ERR_TMPL_PRDR_TEMPLATES}Server returned status code {{}} for {{}}'
 ERR_TMPL_NO_NETWORK = f'{ERR_TMPL_PRDR_TEMPLATES}Please ensure you have network connection. Error detail: {{}}'
 ERR_TMPL_BAD_JSON = f'{ERR_TMPL_PRDR_TEMPLATES}Response body does not contain valid json. Error detail: {{}}'
+ERR_TMPL_GITHUB_NON_200 = 'GitHub returned status code {} for {}'
 
 TRIES = 3
+TIMEOUT = (3.05, 30)
 
 logger = get_logger(__name__)
 
+# share one session so repeated calls to api.github.com reuse the pooled connection
+_session = requests.Session()
+_session.mount('https://', HTTPAdapter(pool_connections=4, pool_maxsize=4, max_retries=Retry(
+    total=TRIES, backoff_factor=0.5, status_forcelist=[502, 503, 504], raise_on_status=False)))
+
+
+ETAG_CACHE_FILE = Path(get_config_dir()) / 'bake' / 'github-etags.json'
+LATEST_RELEASE_CACHE_FILE = Path(get_config_dir()) / 'bake' / 'latest-release.json'
+LATEST_RELEASE_CACHE_TTL = 3600
+
+_etag_cache = None
+
+
+def _get(url, headers=None):
+    return _session.get(url, headers=headers, verify=not should_disable_connection_verify(), timeout=TIMEOUT)
+
+
+def _load_etag_cache():
+    global _etag_cache  # pylint: disable=global-statement
+    if _etag_cache is None:
+        try:
+            with open(ETAG_CACHE_FILE, 'r', encoding='utf-8') as f:
+                _etag_cache = json.load(f)
+        except (OSError, ValueError):
+            _etag_cache = {}
+    return _etag_cache
+
+
+def _save_etag_cache():
+    try:
+        ETAG_CACHE_FILE.parent.mkdir(parents=True, exist_ok=True)
+        with open(ETAG_CACHE_FILE, 'w', encoding='utf-8') as f:
+            json.dump(_etag_cache, f)
+    except OSError as err:
+        logger.info(f'Unable to write GitHub etag cache: {err}')
+
+
+def _cached_get_json(url):
+    '''GET a json GitHub api url, sending If-None-Match so unchanged responses come back as a 304 with no body.
+    Returns a tuple of the status code and the parsed json (None for a 404). Any other error status raises'''
+    cache = _load_etag_cache()
+    entry = cache.get(url)
+
+    response = _get(url, headers={'If-None-Match': entry['etag']} if entry else None)
+
+    if response.status_code == 304 and entry:
+        logger.info(f'Using cached response for {url}')
+        return 200, entry['body']
+
+    if response.status_code == 404:
+        return 404, None
+
+    if response.status_code != 200:
+        raise ClientRequestError(ERR_TMPL_GITHUB_NON_200.format(response.status_code, url))
+
+    body = response.json()
+    if (etag := response.headers.get('ETag')):
+        cache[url] = {'etag': etag, 'body': body}
+        _save_etag_cache()
+
+    return response.status_code, body
+
 
 def get_github_releases(org='rogerbestmsft', repo='az-bake', prerelease=False):
     url = f'https://api.github.com/repos/{org}/{repo}/releases'
 
-    version_res = requests.get(url, verify=not should_disable_connection_verify())
-    version_json = version_res.json()
+    status_code, version_json = _cached_get_json(url)
+
+    if status_code == 404:
+        raise ClientRequestError(ERR_TMPL_GITHUB_NON_200.format(status_code, url))
 
     return [v for v in version_json if v['prerelease'] == prerelease]
 
@@ -43,38 +124,68 @@ def get_github_release(org='rogerbestmsft', repo='az-bake', version=None, prerel
 
     url += (f'/tags/{version}' if version else '/latest')
 
-    version_res = requests.get(url, verify=not should_disable_connection_verify())
+    status_code, version_json = _cached_get_json(url)
 
-    if version_res.status_code == 404:
+    if status_code == 404:
         raise ClientRequestError(
             f'No release version exists for {org}/{repo}. Specify a specific prerelease version with --version '
             'or use latest prerelease with --pre')
 
-    return version_res.json()
+    return version_json
+
 
+def _load_latest_release_cache():
+    try:
+        with open(LATEST_RELEASE_CACHE_FILE, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
 
+
+@lru_cache(maxsize=8)
 def get_github_latest_release_version(org='rogerbestmsft', repo='az-bake', prerelease=False):
+    '''Get the latest release tag name. The result is also kept on disk for LATEST_RELEASE_CACHE_TTL
+    seconds so subsequent cli invocations skip the round-trip to GitHub'''
+    key = f'{org}/{repo}{"/prerelease" if prerelease else ""}'
+    cache = _load_latest_release_cache()
+
+    if (entry := cache.get(key)) and time.time() - entry.get('fetched_at', 0) < LATEST_RELEASE_CACHE_TTL:
+        logger.info(f'Using cached latest release version for {org}/{repo}')
+        return entry['version']
+
     logger.info(f'Getting latest release version from GitHub ({org}/{repo})')
     version_json = get_github_release(org, repo, prerelease=prerelease)
-    return version_json['tag_name']
+    version = version_json['tag_name']
+
+    cache[key] = {'version': version, 'fetched_at': time.time()}
+    try:
+        LATEST_RELEASE_CACHE_FILE.parent.mkdir(parents=True, exist_ok=True)
+        with open(LATEST_RELEASE_CACHE_FILE, 'w', encoding='utf-8') as f:
+            json.dump(cache, f)
+    except OSError as err:
+        logger.info(f'Unable to write latest release cache: {err}')
+
+    return version
 
 
 def github_release_version_exists(version, org='rogerbestmsft', repo='az-bake'):
     logger.info(f'Checking if release version {version} exists on GitHub ({org}/{repo})')
     version_url = f'https://api.github.com/repos/{org}/{repo}/releases/tags/{version}'
-    version_res = requests.get(version_url, verify=not should_disable_connection_verify())
+    version_res = _get(version_url)
     return version_res.status_code < 400
 
 
 def get_release_asset(asset_url, to_json=True):  # pylint: disable=inconsistent-return-statements
     for try_number in range(TRIES):
         try:
-            response = requests.get(asset_url, verify=not should_disable_connection_verify())
+            response = _get(asset_url)
             if response.status_code == 200:
-                return response.json() if to_json else response
+                # parse the raw bytes directly instead of decoding to str first
+                return json_loads(response.content) if to_json else response
             msg = ERR_TMPL_NON_200.format(response.status_code, asset_url)
             raise ClientRequestError(msg)
-        except (requests.exceptions.ConnectionError, requests.exceptions.HTTPError) as err:
+        except (requests.exceptions.ConnectionError, requests.exceptions.HTTPError,
+                requests.exceptions.Timeout) as err:
             msg = ERR_TMPL_NO_NETWORK.format(str(err))
             raise ClientRequestError(msg) from err
         except ValueError as err:
@@ -82,7 +193,6 @@ def get_release_asset(asset_url, to_json=True):  # pylint: disable=inconsistent-
             if try_number == TRIES - 1:
                 msg = ERR_TMPL_BAD_JSON.format(str(err))
                 raise ClientRequestError(msg) from err
-            import time  # pylint: disable=import-outside-toplevel
             time.sleep(0.5)
             continue
 
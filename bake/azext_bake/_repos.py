@@ -5,14 +5,39 @@
 # pylint: disable=too-many-instance-attributes
 
 import os
+import re
 
 from dataclasses import dataclass, field
 from typing import Literal
+from urllib.parse import urlsplit, urlunsplit
 
 from azure.cli.core.azclierror import CLIError
 
 from ._constants import DEVOPS_PROVIDER_NAME, GITHUB_PROVIDER_NAME
 
+# environment variables that must all be set (non-empty) to detect each CI provider
+GITHUB_ACTIONS_ENV_VARS = ('CI', 'GITHUB_ACTION')
+DEVOPS_ENV_VARS = ('TF_BUILD',)
+
+# (lowercased url pattern, provider, normalized url template) for each supported repository url shape
+REPO_URL_PATTERNS = (
+    # git://github.com/rogerbestmsft/az-bake.git
+    # https://github.com/rogerbestmsft/az-bake.git
+    # git@github.com:colbylwilliams/az-bake.git
+    (re.compile(r'^(?:git://|https?://(?:[^@/]+@)?|git@)github\.com[:/](?P<org>[^/]+)/(?P<repo>[^/]+?)(?:\.git)?/?$'),
+     GITHUB_PROVIDER_NAME, 'https://github.com/{org}/{repo}'),
+    # https://dev.azure.com/rogerbestmsft/MyProject/_git/az-bake
+    # https://colbylwilliams@dev.azure.com/rogerbestmsft/MyProject/_git/az-bake
+    # git@ssh.dev.azure.com:v3/rogerbestmsft/MyProject/az-bake
+    (re.compile(r'^(?:https?://(?:[^@/]+@)?dev\.azure\.com/|git@ssh\.dev\.azure\.com:v3/)'
+                r'(?P<org>[^/]+)/(?P<project>[^/]+)/(?:_git/)?(?P<repo>[^/]+?)(?:\.git)?/?$'),
+     DEVOPS_PROVIDER_NAME, 'https://dev.azure.com/{org}/{project}/_git/{repo}'),
+    # https://colbylwilliams.visualstudio.com/DefaultCollection/MyProject/_git/az-bake
+    (re.compile(r'^https?://(?:[^@/]+@)?(?P<org>[^@/.]+)\.visualstudio\.com/(?P<collection>defaultcollection/)?'
+                r'(?P<project>[^/]+)/(?:_git/)?(?P<repo>[^/]+?)(?:\.git)?/?$'),
+     DEVOPS_PROVIDER_NAME, 'https://{org}.visualstudio.com/{collection}{project}/_git/{repo}'),
+)
+
 
 @dataclass
 class CI:
@@ -22,32 +47,40 @@ class CI:
     ref: str = None
     revision: str = None
 
+    @staticmethod
+    def _detect(env):
+        '''Returns the CI provider name for the given environment, or None if not running in CI'''
+        if all(env.get(k) for k in GITHUB_ACTIONS_ENV_VARS):
+            return GITHUB_PROVIDER_NAME
+        if all(env.get(k) for k in DEVOPS_ENV_VARS):
+            return DEVOPS_PROVIDER_NAME
+        return None
+
     @staticmethod
     def is_ci():
-        is_actions = os.environ.get('CI', False) and os.environ.get('GITHUB_ACTION', False)
-        is_devops = os.environ.get('TF_BUILD', False)
-        return bool(is_actions or is_devops)
+        return CI._detect(os.environ) is not None
 
     def __init__(self) -> None:
-        if os.environ.get('CI', False) and os.environ.get('GITHUB_ACTION', False):
-            self.provider = GITHUB_PROVIDER_NAME
-            self.token = os.environ.get('GITHUB_TOKEN', None)
-            self.ref = os.environ.get('GITHUB_REF', None)
-            self.revision = os.environ.get('GITHUB_SHA', None)
+        env = os.environ
+        self.provider = CI._detect(env)
 
-            github_server_url = os.environ.get('GITHUB_SERVER_URL', None)
-            github_repository = os.environ.get('GITHUB_REPOSITORY', None)
+        if self.provider == GITHUB_PROVIDER_NAME:
+            self.token = env.get('GITHUB_TOKEN')
+            self.ref = env.get('GITHUB_REF')
+            self.revision = env.get('GITHUB_SHA')
+
+            github_server_url = env.get('GITHUB_SERVER_URL')
+            github_repository = env.get('GITHUB_REPOSITORY')
             if github_server_url and github_repository:
                 self.url = f'{github_server_url}/{github_repository}'
             else:
                 raise CLIError('Could not determine GitHub repository url from environment variables.')
 
-        elif os.environ.get('TF_BUILD', False):
-            self.provider = DEVOPS_PROVIDER_NAME
-            self.token = os.environ.get('SYSTEM_ACCESSTOKEN', None)
-            self.ref = os.environ.get('BUILD_SOURCEBRANCH', None)
-            self.revision = os.environ.get('BUILD_SOURCEVERSION', None)
-            self.url = os.environ.get('BUILD_REPOSITORY_URI', None)
+        elif self.provider == DEVOPS_PROVIDER_NAME:
+            self.token = env.get('SYSTEM_ACCESSTOKEN')
+            self.ref = env.get('BUILD_SOURCEBRANCH')
+            self.revision = env.get('BUILD_SOURCEVERSION')
+            self.url = env.get('BUILD_REPOSITORY_URI')
             if not self.url:
                 raise CLIError('Could not determine Azure DevOps repository url from environment variables.')
 
@@ -70,86 +103,39 @@ class Repo:
     revision: str = None
     clone_url: str = None
 
-    def _parse_devops_url(self, url):
-        '''Parse an Azure DevOps repository git url into its parts'''
-        # examples:
-        # https://dev.azure.com/rogerbestmsft/MyProject/_git/az-bake
-        # https://colbylwilliams.visualstudio.com/DefaultCollection/MyProject/_git/az-bake
-        # https://colbylwilliams@dev.azure.com/rogerbestmsft/MyProject/_git/az-bake
-
-        url = url.lower().replace('git@ssh', 'https://').replace(':v3/', '/')
-
-        if '@dev.azure.com' in url:
-            url = 'https://dev.azure.com' + url.split('@dev.azure.com')[1]
-
-        if url.endswith('.git'):
-            url = url[:-4]
-
-        parts = url.split('/')
-
-        index = next((i for i, part in enumerate(parts) if 'dev.azure.com' in part or 'visualstudio.com' in part), -1)
-
-        if index == -1:
-            raise CLIError(f'{url} is not a valid Azure DevOps respository url')
-
-        if '_git' in parts:
-            parts.pop(parts.index('_git'))
-        else:
-            last = parts[-1]
-            url = url.replace(f'/{last}', f'/_git/{last}')
-
-        if 'dev.azure.com' in parts[index]:
-            index += 1
-
-        if len(parts) < index + 3:
-            raise CLIError(f'{url} is not a valid Azure DevOps respository url')
-
-        self.url = url
-        self.org = parts[index].replace('.visualstudio.com', '')
-
-        if parts[index + 1] == 'defaultcollection':
-            index += 1
-
-        self.project = parts[index + 1]
-        self.repo = parts[index + 2]
-
-    def _parse_github_url(self, url):
-        '''Parse a GitHub repository git url into its parts'''
-        # examples:
-        # git://github.com/rogerbestmsft/az-bake.git
-        # https://github.com/rogerbestmsft/az-bake.git
-        # git@github.com:colbylwilliams/az-bake.git
-
-        url = url.lower().replace('git@', 'https://').replace('git://', 'https://')\
-            .replace('github.com:', 'github.com/')
-
-        if url.endswith('.git'):
-            url = url[:-4]
-
-        parts = url.split('/')
-
-        index = next((i for i, part in enumerate(parts) if 'github.com' in part), -1)
-
-        if index == -1 or len(parts) < index + 3:
-            raise CLIError(f'{url} is not a valid GitHub repository url')
-
-        self.url = url
-        self.org = parts[index + 1]
-        self.repo = parts[index + 2]
+    def _parse_url(self, url):
+        '''Parse a (lowercased) GitHub or Azure DevOps repository git url into its parts'''
+        for pattern, provider, template in REPO_URL_PATTERNS:
+            if provider == self.provider and (match := pattern.match(url)):
+                parts = match.groupdict(default='')
+                self.url = template.format(**parts)
+                self.org = parts['org']
+                self.project = parts.get('project') or None
+                self.repo = parts['repo']
+                return
+        name = 'GitHub' if self.provider == GITHUB_PROVIDER_NAME else 'Azure DevOps'
+        raise CLIError(f'{url} is not a valid {name} repository url')
 
     def __post_init__(self):
-        if 'github.com' in self.url.lower():
+        url = self.url.lower()
+        if 'github.com' in url:
             self.provider = GITHUB_PROVIDER_NAME
-            self._parse_github_url(self.url)
-            self.clone_url = self.url.replace('https://', f'https://gituser:{self.token}@') if self.token else self.url
-        elif 'dev.azure.com' in self.url.lower() or 'visualstudio.com' in self.url.lower():
+            user = 'gituser'
+        elif 'dev.azure.com' in url or 'visualstudio.com' in url:
             self.provider = DEVOPS_PROVIDER_NAME
-            self._parse_devops_url(self.url)
-            self.clone_url = self.url.replace(
-                'https://', f'https://azurereposuser:{self.token}@') if self.token else self.url
+            user = 'azurereposuser'
         else:
             raise CLIError(f'{self.url} is not a valid Azure DevOps or GitHub respository url')
 
+        self._parse_url(url)
+
+        if self.token:
+            # the normalized url never has credentials, so the token is the netloc's only userinfo
+            parts = urlsplit(self.url)
+            self.clone_url = urlunsplit(parts._replace(netloc=f'{user}:{self.token}@{parts.netloc}'))
+        else:
+            self.clone_url = self.url
+
 
 if __name__ == '__main__':
 
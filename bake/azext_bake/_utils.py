@@ -6,7 +6,9 @@
 
 import json
 import os
+import stat
 
+from functools import lru_cache
 from pathlib import Path
 from shutil import copy2, copytree
 from typing import List, Sequence, TypeVar
@@ -15,6 +17,11 @@ from xml.etree.ElementTree import Element, tostring
 
 import yaml
 
+try:
+    from yaml import CSafeLoader as YamlSafeLoader
+except ImportError:
+    from yaml import SafeLoader as YamlSafeLoader
+
 from azure.cli.core.azclierror import FileOperationError, ValidationError
 from knack.log import get_logger as knack_get_logger
 
@@ -86,19 +93,18 @@ def get_yaml_file_path(dirpath, file, required=True):
     '''Get the path to a yaml or yml file in a directory'''
     dir_path = (dirpath if isinstance(dirpath, Path) else Path(dirpath)).resolve()
 
-    if not dir_path.is_dir():
-        if required:
-            raise ValidationError(f'Directory for yaml/yml {file} not found at {dirpath}')
-        return None
-
     yaml_path = dir_path / f'{file}.yaml'
     yml_path = dir_path / f'{file}.yml'
 
+    # probe the files by path so the filesystem decides case sensitivity (i.e. Bake.yml on windows and macOS)
     yaml_isfile = yaml_path.is_file()
     yml_isfile = yml_path.is_file()
 
     if not yaml_isfile and not yml_isfile:
         if required:
+            # only stat the directory to pick the error message
+            if not dir_path.is_dir():
+                raise ValidationError(f'Directory for yaml/yml {file} not found at {dirpath}')
             raise ValidationError(f'File {file}.yaml or {file}.yml not found in {dirpath}')
         return None
 
@@ -106,9 +112,7 @@ def get_yaml_file_path(dirpath, file, required=True):
         raise ValidationError(f'Found both {file}.yaml and {file}.yml in {dirpath} of repository. '
                               f'Only one {file} yaml file allowed')
 
-    file_path = yaml_path if yaml_path.is_file() else yml_path
-
-    return file_path
+    return yaml_path if yaml_isfile else yml_path
 
 
 def get_yaml_file_contents(path):
@@ -118,7 +122,7 @@ def get_yaml_file_contents(path):
         raise FileOperationError(f'Could not find yaml file at {path}')
     try:
         with open(path, 'r', encoding='utf-8') as f:
-            obj = yaml.safe_load(f)
+            obj = yaml.load(f, Loader=YamlSafeLoader)
     except OSError:  # FileNotFoundError introduced in Python 3
         raise FileOperationError(f'No such file or directory: {path}')  # pylint: disable=raise-missing-from
     except yaml.YAMLError as e:
@@ -133,6 +137,19 @@ TData = TypeVar('TData')
 
 def get_yaml_file_data(data_type: TData, path: Path) -> TData:
     '''Get the data from a yaml file'''
+    path = (path if isinstance(path, Path) else Path(path)).resolve()
+    try:
+        mtime_ns = path.stat().st_mtime_ns
+    except OSError:
+        # let get_yaml_file_contents raise the appropriate error
+        return data_type(get_yaml_file_contents(path), path)
+    return _get_yaml_file_data(data_type, path, mtime_ns)
+
+
+@lru_cache(maxsize=256)
+def _get_yaml_file_data(data_type: TData, path: Path, mtime_ns: int) -> TData:  # pylint: disable=unused-argument
+    '''Cached get_yaml_file_data. The data objects are treated as read-only once created, so the same instance
+    is returned for a file until it is modified (mtime_ns is only part of the cache key)'''
     obj = get_yaml_file_contents(path)
     return data_type(obj, path)
 
@@ -188,20 +205,21 @@ def get_choco_package_config(packages: Sequence[ChocoPackage], indent=2) -> str:
     return xml_string
 
 
+# ChocoPackage attribute -> choco install option, in the order they are added to the setup string
+CHOCO_SETUP_OPTIONS = (
+    ('source', '--source'),
+    ('version', '--version'),
+    ('install_arguments', '--install-arguments'),
+    ('package_parameters', '--package-parameters'),
+)
+
+
 def get_choco_package_setup(package: ChocoPackage) -> str:
     '''Get the chocolatey package setup string'''
     logger.info('Getting choco package setup contents from install dict')
-    pkg = get_dict(package)
-    if 'user' in pkg:
-        del pkg['user']
-    choco_setup_string = ''
-
-    for key in pkg:
-        if key not in ('id', 'restart'):
-            choco_setup_string += f" --{key} '{pkg[key]}'"
-
-    choco_setup_string += '--yes --no-progress'
-    return choco_setup_string
+    options = [f"{flag} '{value}'" for attr, flag in CHOCO_SETUP_OPTIONS
+               if (value := getattr(package, attr)) is not None]
+    return ' '.join(options + ['--yes', '--no-progress'])
 
 
 def get_install_winget(image: Image):
@@ -281,9 +299,11 @@ def get_install_activesetup_commands(image: Image) -> List[str]:
 def _validate_file_path(path, name=None) -> Path:
     file_path = (path if isinstance(path, Path) else Path(path)).resolve()
     not_exists = f'Could not find {name} file at {file_path}' if name else f'{file_path} is not a file or directory'
-    if not file_path.exists():
-        raise ValidationError(not_exists)
-    if not file_path.is_file():
+    try:
+        mode = file_path.stat().st_mode
+    except OSError:
+        raise ValidationError(not_exists)  # pylint: disable=raise-missing-from
+    if not stat.S_ISREG(mode):
         raise ValidationError(f'{file_path} is not a file')
     return file_path
 
@@ -6,16 +6,16 @@
 
 import ipaddress
 import os
+import stat
+import time
 
 from datetime import datetime, timezone
+from functools import lru_cache
 from pathlib import Path
-from re import match
+from urllib.parse import urlsplit
 
 from azure.cli.core.azclierror import (ArgumentUsageError, CLIError, InvalidArgumentValueError,
                                        MutuallyExclusiveArgumentError, RequiredArgumentMissingError, ValidationError)
-from azure.cli.core.commands.parameters import get_resources_in_subscription
-from azure.cli.core.commands.validators import validate_tags
-from azure.cli.core.extension import get_extension
 from azure.mgmt.core.tools import is_valid_resource_id, parse_resource_id
 
 from ._constants import (AZ_BAKE_BUILD_IMAGE_NAME, AZ_BAKE_IMAGE_BUILDER, AZ_BAKE_IMAGE_BUILDER_VERSION,
@@ -30,6 +30,21 @@ from ._utils import get_logger, get_yaml_file_data, get_yaml_file_path
 logger = get_logger(__name__)
 
 
+# values the shell can pass for an argument that was given without a value
+EMPTY_ARG_VALUES = frozenset({'', '""', "''"})
+
+GALLERIES_CACHE_TTL = 60
+
+_galleries_cache = {}
+
+# git remote host (or parent domain) -> repository provider
+GIT_PROVIDER_HOSTS = {
+    'github.com': GITHUB_PROVIDER_NAME,
+    'dev.azure.com': DEVOPS_PROVIDER_NAME,
+    'visualstudio.com': DEVOPS_PROVIDER_NAME,
+}
+
+
 def process_sandbox_create_namespace(cmd, ns):
 
     if not ns.sandbox_resource_group_name:
@@ -51,17 +66,13 @@ def process_bake_repo_build_namespace(cmd, ns):
     # if hasattr(ns, 'sandbox_resource_group_name') and ns.sandbox_resource_group_name \
     #     and hasattr(ns, 'gallery_resource_id') and ns.gallery_resource_id:
 
-    repository_path_validator(cmd, ns)
-    repository_images_validator(cmd, ns)
-    bake_yaml_validator(cmd, ns)
+    _validate_bake_repo(cmd, ns)
 
-    if CI.is_ci():
+    if (ci := _get_ci(cmd)) is not None:
         logger.info('Running in CI environment')
         if ns.repository_url or ns.repository_token or ns.repository_revision:
             raise ArgumentUsageError('--repo-url, --repo-token, and --repo-revision can not be used in a CI environment')
 
-        ci = CI()
-
         if ci.token is None:
             env_key = 'GITHUB_TOKEN' if ci.provider == GITHUB_PROVIDER_NAME else 'SYSTEM_ACCESSTOKEN'
             logger.warning(f'WARNING: {env_key} environment variable not set. This is required for private repositories.')
@@ -84,7 +95,20 @@ def process_bake_repo_build_namespace(cmd, ns):
     ns.repo = repo
 
 
+def _get_ci(cmd):
+    '''Get the CI environment or None if not running in CI. The result is stored
+    on cli_ctx.data so the environment is only inspected once per invocation'''
+    if 'bake_ci' not in cmd.cli_ctx.data:
+        cmd.cli_ctx.data['bake_ci'] = CI() if CI.is_ci() else None
+    return cmd.cli_ctx.data['bake_ci']
+
+
 def process_bake_repo_validate_namespace(cmd, ns):
+    _validate_bake_repo(cmd, ns)
+
+
+def _validate_bake_repo(cmd, ns):
+    '''Run the repository, images, and bake.yaml validators'''
     repository_path_validator(cmd, ns)
     repository_images_validator(cmd, ns)
     bake_yaml_validator(cmd, ns)
@@ -139,31 +163,25 @@ def repository_images_validator(cmd, ns):
 
     images_path = _validate_dir_path(ns.repository_path / 'images', name='images')
 
-    image_dirs = []
-    image_names = []
-
-    images = getattr(ns, 'image_names', None)
+    images = vars(ns).get('image_names')
 
     all_images = not images or not isinstance(images, list) or len(images) == 0
 
-    # walk the images directory and find all the child directories
-    for dirpath, _, _ in os.walk(images_path):
-        # os.walk includes the root directory (i.e. repo/images) so we need to skip it
-        if not images_path.samefile(dirpath) and Path(dirpath).parent.samefile(images_path):
-            image_dirs.append(Path(dirpath))
-            image_names.append(Path(dirpath).name)
+    # find all the direct child directories of the images directory (image name -> image dir)
+    with os.scandir(images_path) as entries:
+        image_dirs = {entry.name: Path(entry.path) for entry in entries if entry.is_dir(follow_symlinks=False)}
 
     # if specific images were specified, validate they exist
     if not all_images:
-        bad_names = [i for i in images if i not in image_names]
+        bad_names = [i for i in images if i not in image_dirs]
         if bad_names:
             raise InvalidArgumentValueError(f'--images/-i {bad_names} are not a valid images')
+        images = frozenset(images)
 
     ns.images = []
-
-    # for each image, validate the image.yaml file exists and get the path
-    for image_dir in image_dirs:
-        if all_images or image_dir.name in images:
+    for name, image_dir in image_dirs.items():
+        if all_images or name in images:
+            # validate the image.yaml file exists and get the path
             image_yaml = get_yaml_file_path(image_dir, 'image', required=True)
             ns.images.append(image_yaml_validator(cmd, ns, image_yaml))
 
@@ -173,48 +191,67 @@ def repository_path_validator(cmd, ns):
     if not ns.repository_path:
         raise RequiredArgumentMissingError('--repo-path/--repo is required')
 
-    repo_path = _validate_dir_path(ns.repository_path, name='repository')
+    repo_path = _validate_dir_path(ns.repository_path, name='repository', resolve=True)
     ns.repository_path = repo_path
 
     git_path = _validate_dir_path(repo_path / '.git', name='.git')
-    if hasattr(ns, 'git_path'):
+    if 'git_path' in vars(ns):
         ns.git_path = git_path
 
-    if hasattr(ns, 'repository_provider'):
+    if 'repository_provider' in vars(ns):
         if ns.repository_provider and ns.repository_provider not in [GITHUB_PROVIDER_NAME, DEVOPS_PROVIDER_NAME]:
             raise InvalidArgumentValueError(f'--repo-provider/--provider must be one of {GITHUB_PROVIDER_NAME} '
                                             f'or {DEVOPS_PROVIDER_NAME}')
 
-        # if the repository provider is not specified, try to determine it from the git config
+        # the provider was specified, so there's nothing to determine from the git config
+        if ns.repository_provider:
+            return
+
         git_config = _validate_file_path(git_path / 'config', 'git config')
-        config_lines = git_config.read_text(encoding='UTF-8').splitlines()
         remote_url = None
-        for line in config_lines:
-            line_clean = line.strip()
-            if line_clean.startswith('url = '):
-                remote_url = line_clean.replace('url = ', '')
-
-        if not remote_url:
-            raise ValidationError('Unable to determine repository provider from git config. '
-                                  'Please specify --repo-provider/--provider')
-
-        if 'github.com' in remote_url:
-            ns.repository_provider = GITHUB_PROVIDER_NAME
-        elif 'dev.azure.com' in remote_url or 'visualstudio.com' in remote_url:
-            ns.repository_provider = DEVOPS_PROVIDER_NAME
+        with open(git_config, 'r', encoding='UTF-8') as f:
+            # stream the file and stop at the first remote url
+            for line in f:
+                line_clean = line.strip()
+                if line_clean.startswith('url = '):
+                    remote_url = line_clean[len('url = '):]
+                    break
+
+        provider = _get_git_provider(remote_url) if remote_url else None
+
+        if provider:
+            ns.repository_provider = provider
         else:
             raise ValidationError('Unable to determine repository provider from git config. '
                                   'Please specify --repo-provider/--provider')
 
 
+def _get_git_provider(remote_url):
+    '''Get the repository provider for a git remote url, or None if it can't be determined'''
+    host = _get_git_remote_host(remote_url)
+    provider = next((p for h, p in GIT_PROVIDER_HOSTS.items() if host == h or host.endswith(f'.{h}')), None)
+    if provider is None:
+        # ssh host aliases from ~/.ssh/config (i.e. git@github.com-work:org/repo.git) aren't real hosts
+        provider = next((p for h, p in GIT_PROVIDER_HOSTS.items() if host.startswith(f'{h}-')), None)
+    return provider
+
+
+def _get_git_remote_host(remote_url):
+    '''Get the lowercase host from a git remote url, including scp-like ssh urls (i.e. git@github.com:org/repo.git)'''
+    if '://' in remote_url:
+        return urlsplit(remote_url).hostname or ''
+    return remote_url.split(':', 1)[0].rsplit('@', 1)[-1].lower()
+
+
 def image_names_validator(cmd, ns):
-    if ns.image_names:
-        if not isinstance(ns.image_names, list):
-            raise InvalidArgumentValueError('--image/-i must be a list of strings')
+    # None (the common case) and empty values fall through on the truthiness check, before any type check
+    if (image_names := ns.image_names) and not isinstance(image_names, list):
+        raise InvalidArgumentValueError('--image/-i must be a list of strings')
 
 
 def validate_sandbox_tags(cmd, ns):
     if ns.tags:
+        from azure.cli.core.commands.validators import validate_tags
         validate_tags(ns)
 
     tags_dict = {} if ns.tags is None else ns.tags
@@ -227,13 +264,26 @@ def validate_sandbox_tags(cmd, ns):
         if ns.prerelease:
             tags_dict.update({tag_key('sandbox-prerelease'): ns.prerelease})
 
+    tags_dict.update({tag_key('cli-version'): _get_bake_extension_version()})
+
+    ns.tags = tags_dict
+
+
+@lru_cache(maxsize=1)
+def _get_bake_extension_version():
+    '''Get the installed bake extension version (i.e. v0.0.0). The version can't change while
+    the cli is running, so this is cached to avoid re-reading the extension metadata from disk'''
+    from azure.cli.core.extension import get_extension
     ext = get_extension('bake')
-    ext_version = ext.get_version()
-    cur_version_str = f'v{ext_version}'
+    return f'v{ext.get_version()}'
 
-    tags_dict.update({tag_key('cli-version'): cur_version_str})
 
-    ns.tags = tags_dict
+@lru_cache(maxsize=128)
+def _parse_net(cidr):
+    '''Parse a CIDR prefix into (ip version, network address int, netmask int, prefix length).
+    The vnet prefixes are checked once for each subnet, so the parsed networks are cached'''
+    net = ipaddress.ip_network(cidr)
+    return net.version, int(net.network_address), int(net.netmask), net.prefixlen
 
 
 def validate_subnet(cmd, ns, subnet, vnet_prefixes):
@@ -243,18 +293,21 @@ def validate_subnet(cmd, ns, subnet, vnet_prefixes):
     subnet_name_arg = f'{subnet}_subnet_name'
     subnet_prefix_arg = f'{subnet}_subnet_address_prefix'
 
-    subnet_name_val = getattr(ns, subnet_name_arg, None)
+    subnet_name_val = vars(ns).get(subnet_name_arg)
     if _none_or_empty(subnet_name_val):
         raise InvalidArgumentValueError(f'{subnet_name_option} must have a value')
 
-    subnet_prefix_val = getattr(ns, subnet_prefix_arg, None)
+    subnet_prefix_val = vars(ns).get(subnet_prefix_arg)
     if _none_or_empty(subnet_prefix_val):
         raise InvalidArgumentValueError(f'{subnet_prefix_option} must be a valid CIDR prefix')
 
     # subnet_prefix_is_default = hasattr(getattr(ns, subnet_prefix_arg), 'is_default')
 
-    vnet_networks = [ipaddress.ip_network(p) for p in vnet_prefixes]
-    if not all(any(h in n for n in vnet_networks) for h in ipaddress.ip_network(subnet_prefix_val).hosts()):
+    sub_version, sub_addr, _, sub_prefixlen = _parse_net(subnet_prefix_val)
+    # the subnet is within a vnet prefix if it is the same ip version, at least as long a prefix,
+    # and its network address masked by the vnet netmask is the vnet network address
+    if not any(version == sub_version and sub_prefixlen >= prefixlen and sub_addr & mask == addr
+               for version, addr, mask, prefixlen in map(_parse_net, vnet_prefixes)):
         raise InvalidArgumentValueError(
             f'{subnet_prefix_option} {subnet_prefix_val} is not within the vnet address space '
             f'(prefixed: {", ".join(vnet_prefixes)})')
@@ -263,7 +316,7 @@ def validate_subnet(cmd, ns, subnet, vnet_prefixes):
 def bake_yaml_validator(cmd, ns, path=None):
 
     if path is None:
-        if hasattr(ns, 'repository_path') and ns.repository_path:
+        if 'repository_path' in vars(ns) and ns.repository_path:
             # should have already run the repository_path_validator
             path = get_yaml_file_path(ns.repository_path, 'bake', required=True)
         else:
@@ -271,13 +324,13 @@ def bake_yaml_validator(cmd, ns, path=None):
 
     bake_config = get_yaml_file_data(BakeConfig, path)
 
-    if hasattr(ns, 'bake_obj'):
+    if 'bake_obj' in vars(ns):
         ns.bake_obj = bake_config
 
-    if hasattr(ns, 'sandbox'):
+    if 'sandbox' in vars(ns):
         ns.sandbox = bake_config.sandbox
 
-    if hasattr(ns, 'gallery'):
+    if 'gallery' in vars(ns):
         ns.gallery = bake_config.gallery
 
     return bake_config
@@ -286,25 +339,25 @@ def bake_yaml_validator(cmd, ns, path=None):
 def image_yaml_validator(cmd, ns, path):
     image = get_yaml_file_data(Image, path)
 
-    if hasattr(ns, 'image'):
+    if 'image' in vars(ns):
         ns.image = image
 
     return image
 
 
 def sandbox_resource_group_name_validator(cmd, ns):
-    if hasattr(ns, 'resource_group_name') and hasattr(ns, 'sandbox_resource_group_name'):
+    if 'resource_group_name' in vars(ns) and 'sandbox_resource_group_name' in vars(ns):
         raise CLIError('Shouldnt specify both resource_group_name and sandbox_resource_group_name')
-    if hasattr(ns, 'resource_group_name'):
+    if 'resource_group_name' in vars(ns):
         rg_name = ns.resource_group_name
-    elif hasattr(ns, 'sandbox_resource_group_name'):
+    elif 'sandbox_resource_group_name' in vars(ns):
         rg_name = ns.sandbox_resource_group_name
     else:
         raise RequiredArgumentMissingError('usage error: --sandbox is required.')
 
     sandbox = get_sandbox_from_group(cmd, rg_name)
 
-    if hasattr(ns, 'sandbox'):
+    if 'sandbox' in vars(ns):
         ns.sandbox = sandbox
 
 
@@ -313,15 +366,14 @@ def gallery_resource_id_validator(cmd, ns):
         if not is_valid_resource_id(ns.gallery_resource_id):
             logger.info('gallery arg provided is not a valid resource id, attempting to find gallery by name')
 
-            galleries = get_resources_in_subscription(cmd.cli_ctx, resource_type='Microsoft.Compute/galleries')
-            gallery = next((g for g in galleries if g.name == ns.gallery_resource_id), None)
+            gallery_id = _get_gallery_ids_by_name(cmd.cli_ctx).get(ns.gallery_resource_id)
 
-            if gallery:
-                ns.gallery_resource_id = gallery.id
+            if gallery_id:
+                ns.gallery_resource_id = gallery_id
             else:
                 raise InvalidArgumentValueError('usage error: --gallery/-r is not a valid resource id or gallery name')
 
-        if hasattr(ns, 'gallery'):
+        if 'gallery' in vars(ns):
             gallery_id = parse_resource_id(ns.gallery_resource_id)
             ns.gallery = Gallery({
                 'name': gallery_id['name'],
@@ -330,6 +382,26 @@ def gallery_resource_id_validator(cmd, ns):
             })
 
 
+def _get_gallery_ids_by_name(cli_ctx):
+    '''Get a map of gallery name to resource id for all galleries in the current subscription.
+    Results are cached per subscription for GALLERIES_CACHE_TTL seconds to avoid listing the subscription repeatedly'''
+    from azure.cli.core.commands.client_factory import get_subscription_id
+    subscription_id = get_subscription_id(cli_ctx)
+
+    cached = _galleries_cache.get(subscription_id)
+    if cached and time.monotonic() - cached[0] < GALLERIES_CACHE_TTL:
+        return cached[1]
+
+    from azure.cli.core.commands.parameters import get_resources_in_subscription
+    galleries = get_resources_in_subscription(cli_ctx, resource_type='Microsoft.Compute/galleries')
+    gallery_ids = {}
+    for g in galleries:
+        gallery_ids.setdefault(g.name, g.id)  # keep the first match, same as a linear search
+
+    _galleries_cache[subscription_id] = (time.monotonic(), gallery_ids)
+    return gallery_ids
+
+
 def bake_source_version_validator(cmd, ns):
     if ns.version:
         if ns.prerelease:
@@ -343,7 +415,7 @@ def bake_source_version_validator(cmd, ns):
 
 def templates_version_validator(cmd, ns):
     if ns.local_templates:
-        if sum(1 for ct in [ns.template_file, ns.version, ns.prerelease, ns.templates_url] if ct) > 1:
+        if _more_than_one(ns.template_file, ns.version, ns.prerelease, ns.templates_url):
             raise MutuallyExclusiveArgumentError(
                 '--local-template cannot be used with --templates-file | --templates-url | --version/-v | --pre',
                 recommendation='Remove all templates-file, --templates-url, --version/-v, and --pre to use the latest'
@@ -354,7 +426,7 @@ def templates_version_validator(cmd, ns):
                 '--template-file cannont be used with --templates-url | --version/-v | --pre',
                 recommendation='Remove all --templates-url, --version/-v, and --pre to use a local template file.')
     else:
-        if sum(1 for ct in [ns.version, ns.prerelease, ns.templates_url] if ct) > 1:
+        if _more_than_one(ns.version, ns.prerelease, ns.templates_url):
             raise MutuallyExclusiveArgumentError(
                 'Only use one of --templates-url | --version/-v | --pre',
                 recommendation='Remove all --templates-url, --version/-v, and --pre to use the latest'
@@ -374,42 +446,60 @@ def templates_version_validator(cmd, ns):
 
 
 def yaml_out_validator(cmd, ns):
-    if hasattr(ns, 'outfile') and ns.outfile:
+    if 'outfile' in vars(ns) and ns.outfile:
         if getattr(ns.outfile, 'is_default', None) is None:
             if ns.outdir or ns.stdout:
                 raise MutuallyExclusiveArgumentError(
                     'Only use one of --outdir | --outfile | --stdout',
                     recommendation='Remove all --outdir, --outfile, and --stdout to output a bake.yaml file '
                     'in the current directory, or only specify --stdout to output to stdout.')
-        ns.outfile = Path(ns.outfile).resolve()
+        ns.outfile = _resolve_path(ns.outfile)
     elif ns.outdir and ns.stdout:
         raise MutuallyExclusiveArgumentError(
             'Only use one of --outdir | --stdout',
             recommendation='Remove all --outdir and --stdout to output a bake.yaml file '
             'in the current directory, or only specify --stdout to output to stdout.')
     else:
-        if hasattr(ns, 'outfile'):
+        if 'outfile' in vars(ns):
             ns.outfile = None
         if ns.outdir:
-            ns.outdir = _validate_dir_path(ns.outdir)
+            ns.outdir = _validate_dir_path(ns.outdir, resolve=True)
+
+
+def _resolve_path(path):
+    '''Resolve a path (following symlinks). The path is made absolute first so the cache key includes the cwd'''
+    return _resolve_absolute_path(str(Path(path).absolute()))
+
+
+@lru_cache(maxsize=256)
+def _resolve_absolute_path(path: str):
+    return Path(path).resolve()
 
 
-def _validate_dir_path(path, name=None):
-    dir_path = (path if isinstance(path, Path) else Path(path)).resolve()
+def _validate_dir_path(path, name=None, resolve=False):
+    '''Validate the dir exists. Only resolve symlinks when asked, otherwise just make the path absolute'''
+    dir_path = path if isinstance(path, Path) else Path(path)
+    dir_path = _resolve_path(dir_path) if resolve else dir_path.absolute()
     not_exists = f'Could not find {name} directory at {dir_path}' if name else f'{dir_path} is not a file or directory'
-    if not dir_path.exists():
-        raise ValidationError(not_exists)
-    if not dir_path.is_dir():
+    try:
+        mode = dir_path.stat().st_mode
+    except OSError:
+        raise ValidationError(not_exists)  # pylint: disable=raise-missing-from
+    if not stat.S_ISDIR(mode):
         raise ValidationError(f'{dir_path} is not a directory')
     return dir_path
 
 
-def _validate_file_path(path, name=None):
-    file_path = (path if isinstance(path, Path) else Path(path)).resolve()
+def _validate_file_path(path, name=None, resolve=False):
+    '''Validate the file exists. Only resolve symlinks when asked, otherwise just make the path absolute'''
+    file_path = path if isinstance(path, Path) else Path(path)
+    file_path = _resolve_path(file_path) if resolve else file_path.absolute()
     not_exists = f'Could not find {name} file at {file_path}' if name else f'{file_path} is not a file or directory'
-    if not file_path.exists():
-        raise ValidationError(not_exists)
-    if not file_path.is_file():
+    try:
+        mode = file_path.stat().st_mode
+    except OSError:
+        raise ValidationError(not_exists)  # pylint: disable=raise-missing-from
+    if not stat.S_ISREG(mode):
         raise ValidationError(f'{file_path} is not a file')
     return file_path
 
@@ -428,16 +518,37 @@ def _validate_version(cmd, ns):
 
 
 def _is_valid_version(version):
-    return match(r'^v[0-9]+\.[0-9]+\.[0-9]+$', version) is not None
+    # v<major>.<minor>.<patch> with ascii digits only (str.isdigit alone also accepts other unicode digits)
+    if not version.startswith('v'):
+        return False
+    parts = version[1:].split('.')
+    return len(parts) == 3 and all(part.isascii() and part.isdigit() for part in parts)
 
 
 def _is_valid_url(url):
-    return match(
-        r'^http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\(\), ]|(?:%[0-9a-fA-F][0-9a-fA-F]))+$', url) is not None
+    # most invalid values are rejected by the scheme prefix without parsing the url
+    if not url.startswith(('http://', 'https://')):
+        return False
+    try:
+        return bool(urlsplit(url).netloc)
+    except ValueError:  # i.e. an unterminated ipv6 host
+        return False
+
+
+def _more_than_one(*vals):
+    '''Returns True if more than one of the values is truthy, stopping as soon as a second one is found'''
+    found = False
+    for val in vals:
+        if val:
+            if found:
+                return True
+            found = True
+    return False
 
 
 def _none_or_empty(val):
-    return val in ('', '""', "''") or val is None
+    # the isinstance check keeps unhashable values (i.e. a list of prefixes) out of the set lookup
+    return val is None or (isinstance(val, str) and val in EMPTY_ARG_VALUES)
 
 
 def user_validator(cmd, ns):
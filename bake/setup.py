@@ -41,6 +41,7 @@ DEPENDENCIES = [
 DEV_DEPENDENCIES = [
     'pytest>=7.0',
     'pytest-cov>=4.0',
+    'pytest-xdist>=3.0',
 ]
 
 with open('README.rst', 'r', encoding='utf-8') as f:
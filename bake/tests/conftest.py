@@ -29,6 +29,7 @@ def mock_cmd():
     cmd.cli_ctx = MagicMock()
     cmd.cli_ctx.cloud = MagicMock()
     cmd.cli_ctx.cloud.endpoints = MagicMock()
+    cmd.cli_ctx.data = {}  # the per-invocation store the validators cache results in
     cmd.arguments = {}
     return cmd
 
@@ -102,9 +103,20 @@ def sample_bake_config_dict(sample_sandbox_dict, sample_gallery_dict):
     }
 
 
-@pytest.fixture
-def tmp_repo(tmp_path):
-    """Creates a minimal repo layout with bake.yaml and an image dir."""
+@pytest.fixture(scope='session')
+def shared_image_file(tmp_path_factory):
+    """An empty images/MyImage/image.yml shared by tests that only read the path."""
+    image_dir = tmp_path_factory.mktemp('images') / 'MyImage'
+    image_dir.mkdir()
+    image_file = image_dir / 'image.yml'
+    image_file.touch()
+    return image_file
+
+
+@pytest.fixture(scope='module')
+def tmp_repo(tmp_path_factory):
+    """Creates a minimal repo layout with bake.yaml and an image dir, shared read-only by a module's tests."""
+    tmp_path = tmp_path_factory.mktemp('repo')
     # .git directory
     git_dir = tmp_path / '.git'
     git_dir.mkdir()
@@ -41,7 +41,7 @@ class TestConstants:
         assert 'sandbox' in PKR_DEFAULT_VARS
 
     def test_default_tags_is_set(self):
-        assert isinstance(DEFAULT_TAGS, set)
+        assert isinstance(DEFAULT_TAGS, (set, frozenset))
         assert len(DEFAULT_TAGS) > 0
         # Every tag should start with the prefix
         for t in DEFAULT_TAGS:
@@ -232,6 +232,7 @@ class TestChocoPackage:
         pkg = ChocoPackage({'id': 'git'})
         pkg.apply_defaults(defaults)
         assert pkg.source == 'mychoco'
+        assert pkg.id_only is False
 
     def test_apply_defaults_does_not_override(self):
         defaults = ChocoDefaults({'source': 'mychoco'})
@@ -330,6 +331,9 @@ class TestImage:
         assert img.base is not None
         assert img.base.publisher == 'microsoftwindowsdesktop'
 
+    def test_windows_default_base_is_shared(self, sample_image_dict):
+        assert Image(sample_image_dict).base is Image(dict(sample_image_dict)).base
+
     def test_linux_requires_base(self):
         obj = {
             'publisher': 'pub', 'offer': 'off', 'replicaLocations': ['eastus'],
@@ -342,11 +346,9 @@ class TestImage:
         img = Image(sample_linux_image_dict)
         assert img.base.publisher == 'Canonical'
 
-    def test_path_sets_name_and_dir(self, tmp_path):
-        image_dir = tmp_path / 'images' / 'MyImage'
-        image_dir.mkdir(parents=True)
-        image_file = image_dir / 'image.yml'
-        image_file.touch()
+    def test_path_sets_name_and_dir(self, shared_image_file):
+        image_file = shared_image_file
+        image_dir = image_file.parent
 
         obj = {
             'publisher': 'pub', 'offer': 'off', 'replicaLocations': ['eastus'],
@@ -380,12 +382,7 @@ class TestImage:
         img = Image(sample_image_dict)
         assert img.hibernate is False
 
-    def test_with_install_section(self, tmp_path):
-        image_dir = tmp_path / 'images' / 'Img'
-        image_dir.mkdir(parents=True)
-        image_file = image_dir / 'image.yml'
-        image_file.touch()
-
+    def test_with_install_section(self, shared_image_file):
         obj = {
             'publisher': 'pub', 'offer': 'off', 'replicaLocations': ['eastus'],
             'sku': 'sku1', 'version': '1.0.0', 'os': 'Windows',
@@ -395,22 +392,17 @@ class TestImage:
                 },
             },
         }
-        img = Image(obj, path=image_file)
+        img = Image(obj, path=shared_image_file)
         assert img.install is not None
         assert len(img.install.choco.packages) == 2
 
-    def test_with_plan(self, tmp_path):
-        image_dir = tmp_path / 'images' / 'Img'
-        image_dir.mkdir(parents=True)
-        image_file = image_dir / 'image.yml'
-        image_file.touch()
-
+    def test_with_plan(self, shared_image_file):
         obj = {
             'publisher': 'pub', 'offer': 'off', 'replicaLocations': ['eastus'],
             'sku': 'sku1', 'version': '1.0.0', 'os': 'Windows',
             'plan': {'publisher': 'pub', 'name': 'plan1', 'product': 'prod1'},
         }
-        img = Image(obj, path=image_file)
+        img = Image(obj, path=shared_image_file)
         assert img.plan.name == 'plan1'
 
 
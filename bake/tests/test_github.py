@@ -0,0 +1,149 @@
+# ------------------------------------
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+# ------------------------------------
+
+import json
+import time
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import pytest
+from azure.cli.core.azclierror import ClientRequestError
+
+from azext_bake import _github
+from azext_bake._github import (
+    LATEST_RELEASE_CACHE_TTL,
+    get_github_latest_release_version,
+    get_github_release,
+    get_github_releases,
+)
+
+RELEASES_URL = 'https://api.github.com/repos/rogerbestmsft/az-bake/releases'
+LATEST_URL = f'{RELEASES_URL}/latest'
+
+
+def _response(status_code, body=None, etag=None):
+    return SimpleNamespace(status_code=status_code, headers={'ETag': etag} if etag else {}, json=lambda: body)
+
+
+@pytest.fixture
+def etag_cache(tmp_path, monkeypatch):
+    """Points the GitHub etag cache at an empty file location under tmp_path."""
+    cache_file = tmp_path / 'bake' / 'github-etags.json'
+    monkeypatch.setattr(_github, 'ETAG_CACHE_FILE', cache_file)
+    monkeypatch.setattr(_github, '_etag_cache', None)
+    return cache_file
+
+
+@pytest.fixture
+def latest_release_cache(tmp_path, monkeypatch, etag_cache):
+    """Points the latest release cache at tmp_path and clears the in-memory cache in front of it."""
+    cache_file = tmp_path / 'bake' / 'latest-release.json'
+    monkeypatch.setattr(_github, 'LATEST_RELEASE_CACHE_FILE', cache_file)
+    get_github_latest_release_version.cache_clear()
+    yield cache_file
+    get_github_latest_release_version.cache_clear()
+
+
+def _write_latest_release_cache(cache_file, version, fetched_at):
+    cache_file.parent.mkdir(parents=True, exist_ok=True)
+    cache_file.write_text(json.dumps({'rogerbestmsft/az-bake': {'version': version, 'fetched_at': fetched_at}}),
+                          encoding='utf-8')
+
+
+@pytest.fixture
+def mock_get(monkeypatch):
+    """Replaces the shared session's get with a mock; set return_value to the response."""
+    get = MagicMock()
+    monkeypatch.setattr(_github._session, 'get', get)
+    return get
+
+
+# -------------------------------------------------------
+# ETag caching of GitHub api responses
+# -------------------------------------------------------
+
+class TestCachedGetJson:
+    def test_200_writes_etag(self, etag_cache, mock_get):
+        mock_get.return_value = _response(200, {'tag_name': 'v1.0.0'}, etag='"abc"')
+
+        assert get_github_release()['tag_name'] == 'v1.0.0'
+        assert mock_get.call_args.kwargs['headers'] is None
+        assert json.loads(etag_cache.read_text(encoding='utf-8')) == {
+            LATEST_URL: {'etag': '"abc"', 'body': {'tag_name': 'v1.0.0'}}}
+
+    def test_304_reuses_cached_body(self, etag_cache, mock_get):
+        etag_cache.parent.mkdir(parents=True)
+        etag_cache.write_text(json.dumps({LATEST_URL: {'etag': '"abc"', 'body': {'tag_name': 'v1.0.0'}}}),
+                              encoding='utf-8')
+        mock_get.return_value = _response(304)
+
+        assert get_github_release()['tag_name'] == 'v1.0.0'
+        assert mock_get.call_args.kwargs['headers'] == {'If-None-Match': '"abc"'}
+
+    def test_corrupt_cache_file_ignored(self, etag_cache, mock_get):
+        etag_cache.parent.mkdir(parents=True)
+        etag_cache.write_text('{not json', encoding='utf-8')
+        mock_get.return_value = _response(200, {'tag_name': 'v1.0.0'}, etag='"abc"')
+
+        assert get_github_release()['tag_name'] == 'v1.0.0'
+        assert mock_get.call_args.kwargs['headers'] is None
+
+    def test_unwritable_cache_file_ignored(self, etag_cache, mock_get):
+        # a file where the cache directory should be makes the write fail
+        etag_cache.parent.write_text('', encoding='utf-8')
+        mock_get.return_value = _response(200, {'tag_name': 'v1.0.0'}, etag='"abc"')
+
+        assert get_github_release()['tag_name'] == 'v1.0.0'
+
+    def test_404_release_raises(self, etag_cache, mock_get):
+        mock_get.return_value = _response(404, {'message': 'Not Found'})
+        with pytest.raises(ClientRequestError, match='No release version exists'):
+            get_github_release()
+
+    @pytest.mark.parametrize('status_code', [403, 500, 503])
+    def test_error_status_release_raises(self, etag_cache, mock_get, status_code):
+        mock_get.return_value = _response(status_code, {'message': 'API rate limit exceeded'})
+        with pytest.raises(ClientRequestError, match=f'status code {status_code} for {LATEST_URL}'):
+            get_github_release()
+
+    @pytest.mark.parametrize('status_code', [403, 404, 503])
+    def test_error_status_releases_raises(self, etag_cache, mock_get, status_code):
+        mock_get.return_value = _response(status_code, {'message': 'API rate limit exceeded'})
+        with pytest.raises(ClientRequestError, match=f'status code {status_code} for {RELEASES_URL}'):
+            get_github_releases()
+
+
+# -------------------------------------------------------
+# get_github_latest_release_version disk cache
+# -------------------------------------------------------
+
+class TestGetGithubLatestReleaseVersion:
+    def test_fresh_cache_hit(self, latest_release_cache, mock_get):
+        _write_latest_release_cache(latest_release_cache, 'v1.0.0', time.time())
+
+        assert get_github_latest_release_version() == 'v1.0.0'
+        mock_get.assert_not_called()
+
+    def test_expired_cache_refetches(self, latest_release_cache, mock_get):
+        _write_latest_release_cache(latest_release_cache, 'v1.0.0', time.time() - LATEST_RELEASE_CACHE_TTL - 1)
+        mock_get.return_value = _response(200, {'tag_name': 'v2.0.0'})
+
+        assert get_github_latest_release_version() == 'v2.0.0'
+        mock_get.assert_called_once()
+        cached = json.loads(latest_release_cache.read_text(encoding='utf-8'))
+        assert cached['rogerbestmsft/az-bake']['version'] == 'v2.0.0'
+
+    def test_missing_cache_fetches_and_writes(self, latest_release_cache, mock_get):
+        mock_get.return_value = _response(200, {'tag_name': 'v2.0.0'})
+
+        assert get_github_latest_release_version() == 'v2.0.0'
+        assert latest_release_cache.is_file()
+
+    def test_write_failure_still_returns_version(self, latest_release_cache, mock_get):
+        # a file where the cache directory should be makes the write fail
+        latest_release_cache.parent.write_text('', encoding='utf-8')
+        mock_get.return_value = _response(200, {'tag_name': 'v2.0.0'})
+
+        assert get_github_latest_release_version() == 'v2.0.0'
@@ -43,9 +43,14 @@ class TestRepoGitHub:
         repo = Repo(url='https://github.com/myorg/myrepo.git')
         assert repo.clone_url == repo.url
 
-    def test_invalid_github_url(self):
-        with pytest.raises(CLIError):
-            Repo(url='https://github.com/')
+    @pytest.mark.parametrize('url', [
+        'https://github.com/',
+        'https://github.com/myorg/myrepo/tree/main',  # extra path segments
+        'https://www.github.com/myorg/myrepo',
+    ])
+    def test_invalid_github_url(self, url):
+        with pytest.raises(CLIError, match='not a valid GitHub repository url'):
+            Repo(url=url)
 
 
 # -------------------------------------------------------
@@ -57,6 +62,7 @@ class TestRepoDevOps:
         'https://dev.azure.com/rogerbestmsft/MyProject/_git/az-bake',
         'https://rogerbestmsft.visualstudio.com/DefaultCollection/MyProject/_git/az-bake',
         'https://user@dev.azure.com/rogerbestmsft/MyProject/_git/az-bake',
+        'git@ssh.dev.azure.com:v3/rogerbestmsft/MyProject/az-bake',
     ])
     def test_devops_urls(self, url):
         repo = Repo(url=url, token='mytoken')
@@ -66,6 +72,10 @@ class TestRepoDevOps:
         assert repo.repo == 'az-bake'
         assert '@' not in repo.url
 
+    def test_devops_ssh_url_normalized(self):
+        repo = Repo(url='git@ssh.dev.azure.com:v3/rogerbestmsft/MyProject/az-bake')
+        assert repo.url == 'https://dev.azure.com/rogerbestmsft/myproject/_git/az-bake'
+
     def test_devops_clone_url_with_token(self):
         repo = Repo(url='https://dev.azure.com/org/proj/_git/repo', token='tok123')
         assert 'tok123' in repo.clone_url
@@ -74,9 +84,14 @@ class TestRepoDevOps:
         repo = Repo(url='https://dev.azure.com/org/proj/_git/repo')
         assert repo.clone_url == repo.url
 
-    def test_invalid_devops_url(self):
-        with pytest.raises(CLIError):
-            Repo(url='https://dev.azure.com/')
+    @pytest.mark.parametrize('url', [
+        'https://dev.azure.com/',
+        'https://dev.azure.com/org/proj/_git/repo/pullrequests',  # extra path segments
+        'https://org.visualstudio.com/proj/_git/repo/branches',  # extra path segments
+    ])
+    def test_invalid_devops_url(self, url):
+        with pytest.raises(CLIError, match='not a valid Azure DevOps repository url'):
+            Repo(url=url)
 
 
 # -------------------------------------------------------
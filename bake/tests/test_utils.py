@@ -0,0 +1,97 @@
+# ------------------------------------
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+# ------------------------------------
+
+import os
+
+import pytest
+from azure.cli.core.azclierror import ValidationError
+
+from azext_bake._data import ChocoDefaults, ChocoPackage, Gallery
+from azext_bake._utils import get_choco_package_setup, get_yaml_file_data, get_yaml_file_path
+
+
+# -------------------------------------------------------
+# get_choco_package_setup
+# -------------------------------------------------------
+
+class TestGetChocoPackageSetup:
+    def test_id_only(self):
+        assert get_choco_package_setup(ChocoPackage({'id': 'git'})) == '--yes --no-progress'
+
+    def test_all_options(self):
+        package = ChocoPackage({
+            'id': 'git',
+            'source': 'https://myfeed/api/v2',
+            'version': '2.40.0',
+            'installArguments': '/NoShellIntegration',
+            'packageParameters': '/GitOnlyOnPath',
+            'user': True,
+            'restart': True,
+        })
+        assert get_choco_package_setup(package) == (
+            "--source 'https://myfeed/api/v2' --version '2.40.0' --install-arguments '/NoShellIntegration' "
+            "--package-parameters '/GitOnlyOnPath' --yes --no-progress")
+
+    def test_defaults_applied(self):
+        package = ChocoPackage({'id': 'git'})
+        package.apply_defaults(ChocoDefaults({'source': 'https://myfeed/api/v2'}))
+        assert get_choco_package_setup(package) == "--source 'https://myfeed/api/v2' --yes --no-progress"
+
+
+# -------------------------------------------------------
+# get_yaml_file_data
+# -------------------------------------------------------
+
+class TestGetYamlFileData:
+    def test_unchanged_file_is_cached(self, tmp_path):
+        path = tmp_path / 'gallery.yml'
+        path.write_text('name: MyGallery\nresourceGroup: my-gallery-rg\n', encoding='utf-8')
+        assert get_yaml_file_data(Gallery, path) is get_yaml_file_data(Gallery, path)
+
+    def test_modified_file_is_reloaded(self, tmp_path):
+        path = tmp_path / 'gallery.yml'
+        path.write_text('name: MyGallery\nresourceGroup: my-gallery-rg\n', encoding='utf-8')
+        first = get_yaml_file_data(Gallery, path)
+
+        path.write_text('name: OtherGallery\nresourceGroup: my-gallery-rg\n', encoding='utf-8')
+        # set a later mtime explicitly, the write can land in the same timestamp tick on coarse filesystems
+        mtime_ns = path.stat().st_mtime_ns + 1_000_000_000
+        os.utime(path, ns=(mtime_ns, mtime_ns))
+
+        second = get_yaml_file_data(Gallery, path)
+        assert second is not first
+        assert second.name == 'OtherGallery'
+
+
+# -------------------------------------------------------
+# get_yaml_file_path
+# -------------------------------------------------------
+
+class TestGetYamlFilePath:
+    @pytest.mark.parametrize('ext', ['yaml', 'yml'])
+    def test_finds_either_extension(self, tmp_path, ext):
+        (tmp_path / f'bake.{ext}').touch()
+        assert get_yaml_file_path(tmp_path, 'bake') == tmp_path.resolve() / f'bake.{ext}'
+
+    def test_both_extensions_raise(self, tmp_path):
+        (tmp_path / 'bake.yaml').touch()
+        (tmp_path / 'bake.yml').touch()
+        with pytest.raises(ValidationError, match='Found both'):
+            get_yaml_file_path(tmp_path, 'bake')
+
+    def test_missing_file(self, tmp_path):
+        with pytest.raises(ValidationError, match='not found in'):
+            get_yaml_file_path(tmp_path, 'bake')
+        assert get_yaml_file_path(tmp_path, 'bake', required=False) is None
+
+    def test_missing_dir(self, tmp_path):
+        with pytest.raises(ValidationError, match='Directory for yaml/yml bake not found'):
+            get_yaml_file_path(tmp_path / 'missing', 'bake')
+
+    def test_case_insensitive_filesystem(self, tmp_path):
+        (tmp_path / 'Bake.yml').touch()
+        if not (tmp_path / 'bake.yml').exists():
+            pytest.skip('filesystem is case-sensitive')
+        assert get_yaml_file_path(tmp_path, 'bake') is not None
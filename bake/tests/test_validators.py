@@ -5,7 +5,7 @@
 
 from pathlib import Path
 from types import SimpleNamespace
-from unittest.mock import MagicMock, patch
+from unittest.mock import MagicMock
 
 import pytest
 from azure.cli.core.azclierror import (
@@ -15,11 +15,22 @@ from azure.cli.core.azclierror import (
     ValidationError,
 )
 
+from azext_bake._constants import DEVOPS_PROVIDER_NAME, GITHUB_PROVIDER_NAME
+from azext_bake._repos import CI
+from azext_bake import _validators
 from azext_bake._validators import (
+    GALLERIES_CACHE_TTL,
+    _get_ci,
+    _get_gallery_ids_by_name,
+    _get_git_provider,
+    _get_git_remote_host,
     _is_valid_url,
     _is_valid_version,
     _none_or_empty,
     image_names_validator,
+    process_bake_repo_validate_namespace,
+    process_sandbox_create_namespace,
+    repository_path_validator,
     user_validator,
     validate_subnet,
     yaml_out_validator,
@@ -42,6 +53,8 @@ class TestIsValidVersion:
         'v1.2',        # only two segments
         'v1.2.3-pre',  # pre-release suffix
         'vx.y.z',      # non-numeric
+        'v1.2.3\n',    # trailing newline
+        'v1.2.\u0663',  # non-ascii digit
         '',
         'v',
     ])
@@ -65,12 +78,83 @@ class TestIsValidUrl:
     @pytest.mark.parametrize('url', [
         'ftp://example.com',
         'not-a-url',
+        'https://',
+        'http://[::1',
         '',
     ])
     def test_invalid(self, url):
         assert _is_valid_url(url) is False
 
 
+# -------------------------------------------------------
+# _get_git_remote_host
+# -------------------------------------------------------
+
+class TestGetGitRemoteHost:
+    @pytest.mark.parametrize('url,host', [
+        ('https://github.com/org/repo.git', 'github.com'),
+        ('git@github.com:org/repo.git', 'github.com'),
+        ('https://user@dev.azure.com/org/project/_git/repo', 'dev.azure.com'),
+        ('git@ssh.dev.azure.com:v3/org/project/repo', 'ssh.dev.azure.com'),
+        ('https://org.visualstudio.com/project/_git/repo', 'org.visualstudio.com'),
+        ('https://example.com/github.com/repo', 'example.com'),
+        ('git@github.com-work:org/repo.git', 'github.com-work'),
+    ])
+    def test_host(self, url, host):
+        assert _get_git_remote_host(url) == host
+
+    @pytest.mark.parametrize('url,provider', [
+        ('https://github.com/org/repo.git', GITHUB_PROVIDER_NAME),
+        ('git@github.com-work:org/repo.git', GITHUB_PROVIDER_NAME),  # ssh host alias
+        ('git@ssh.dev.azure.com:v3/org/project/repo', DEVOPS_PROVIDER_NAME),
+        ('https://org.visualstudio.com/project/_git/repo', DEVOPS_PROVIDER_NAME),
+        ('https://gitlab.com/org/repo.git', None),
+        ('https://example.com/github.com/repo', None),
+        ('https://gitlab.com/mirrors/github.com-tools.git', None),
+        ('git@gitlab.com:org/dev.azure.com-migration.git', None),
+    ])
+    def test_provider(self, url, provider):
+        assert _get_git_provider(url) == provider
+
+
+class TestGetCi:
+    def test_not_ci_returns_none(self, mock_cmd, clean_env):
+        assert _get_ci(mock_cmd) is None
+        assert mock_cmd.cli_ctx.data['bake_ci'] is None
+
+    def test_ci_is_created_once(self, mock_cmd, clean_env, monkeypatch):
+        monkeypatch.setenv('TF_BUILD', 'True')
+        monkeypatch.setenv('BUILD_REPOSITORY_URI', 'https://dev.azure.com/org/proj/_git/repo')
+        ci = _get_ci(mock_cmd)
+        assert isinstance(ci, CI)
+        assert _get_ci(mock_cmd) is ci
+
+
+class TestRepositoryPathValidator:
+    @staticmethod
+    def _make_repo(path, url):
+        (path / '.git').mkdir()
+        (path / '.git' / 'config').write_text(f'[remote "origin"]\n\turl = {url}\n', encoding='utf-8')
+
+    def test_provider_from_host_alias(self, mock_cmd, tmp_path):
+        self._make_repo(tmp_path, 'git@github.com-work:org/repo.git')
+        ns = make_namespace(repository_path=str(tmp_path), repository_provider=None)
+        repository_path_validator(mock_cmd, ns)
+        assert ns.repository_provider == GITHUB_PROVIDER_NAME
+
+    def test_specified_provider_skips_detection(self, mock_cmd, tmp_path):
+        self._make_repo(tmp_path, 'git@git.example.com:org/repo.git')
+        ns = make_namespace(repository_path=str(tmp_path), repository_provider=DEVOPS_PROVIDER_NAME)
+        repository_path_validator(mock_cmd, ns)
+        assert ns.repository_provider == DEVOPS_PROVIDER_NAME
+
+    def test_unknown_provider_raises(self, mock_cmd, tmp_path):
+        self._make_repo(tmp_path, 'git@git.example.com:org/repo.git')
+        ns = make_namespace(repository_path=str(tmp_path), repository_provider=None)
+        with pytest.raises(ValidationError, match='repository provider'):
+            repository_path_validator(mock_cmd, ns)
+
+
 # -------------------------------------------------------
 # _none_or_empty
 # -------------------------------------------------------
@@ -80,7 +164,7 @@ class TestNoneOrEmpty:
     def test_truthy(self, val):
         assert _none_or_empty(val) is True
 
-    @pytest.mark.parametrize('val', ['hello', ' ', '0', 'false'])
+    @pytest.mark.parametrize('val', ['hello', ' ', '0', 'false', ['10.0.0.0/16']])
     def test_falsy(self, val):
         assert _none_or_empty(val) is False
 
@@ -98,36 +182,18 @@ class TestValidateSubnet:
         # Should NOT raise
         validate_subnet(mock_cmd, ns, 'default', ['10.0.0.0/16'])
 
-    def test_subnet_outside_vnet(self, mock_cmd):
-        ns = make_namespace(
-            default_subnet_name='default',
-            default_subnet_address_prefix='192.168.1.0/24',
-        )
-        with pytest.raises(InvalidArgumentValueError, match='not within the vnet address space'):
-            validate_subnet(mock_cmd, ns, 'default', ['10.0.0.0/16'])
-
-    def test_empty_subnet_name(self, mock_cmd):
-        ns = make_namespace(
-            default_subnet_name='',
-            default_subnet_address_prefix='10.0.0.0/24',
-        )
-        with pytest.raises(InvalidArgumentValueError, match='must have a value'):
-            validate_subnet(mock_cmd, ns, 'default', ['10.0.0.0/16'])
-
-    def test_empty_subnet_prefix(self, mock_cmd):
-        ns = make_namespace(
-            default_subnet_name='default',
-            default_subnet_address_prefix='',
-        )
-        with pytest.raises(InvalidArgumentValueError, match='must be a valid CIDR prefix'):
-            validate_subnet(mock_cmd, ns, 'default', ['10.0.0.0/16'])
-
-    def test_none_subnet_name(self, mock_cmd):
+    @pytest.mark.parametrize('name, prefix, match', [
+        ('default', '192.168.1.0/24', 'not within the vnet address space'),
+        ('', '10.0.0.0/24', 'must have a value'),
+        (None, '10.0.0.0/24', 'must have a value'),
+        ('default', '', 'must be a valid CIDR prefix'),
+    ])
+    def test_invalid_subnet(self, mock_cmd, name, prefix, match):
         ns = make_namespace(
-            default_subnet_name=None,
-            default_subnet_address_prefix='10.0.0.0/24',
+            default_subnet_name=name,
+            default_subnet_address_prefix=prefix,
         )
-        with pytest.raises(InvalidArgumentValueError, match='must have a value'):
+        with pytest.raises(InvalidArgumentValueError, match=match):
             validate_subnet(mock_cmd, ns, 'default', ['10.0.0.0/16'])
 
 
@@ -154,13 +220,15 @@ class TestImageNamesValidator:
 # yaml_out_validator
 # -------------------------------------------------------
 
+class _DefaultArg(str):
+    '''A str carrying is_default, like the values the CLI fills in for unspecified arguments'''
+    is_default = True
+
+
 class TestYamlOutValidator:
     def test_default_outfile_no_conflict(self, mock_cmd):
         """When outfile has is_default attribute, it's not user-specified."""
-        outfile = MagicMock()
-        outfile.is_default = True
-        outfile.__str__ = lambda self: './bake.yml'
-        ns = make_namespace(outfile=outfile, outdir=None, stdout=False)
+        ns = make_namespace(outfile=_DefaultArg('./bake.yml'), outdir=None, stdout=False)
         yaml_out_validator(mock_cmd, ns)  # should not raise
 
     def test_outdir_and_stdout_conflict(self, mock_cmd):
@@ -187,18 +255,31 @@ class TestYamlOutValidator:
         yaml_out_validator(mock_cmd, ns)
         assert ns.outdir == tmp_path.resolve()
 
+    def test_outdir_resolves_symlinks(self, mock_cmd, tmp_path):
+        real_dir = tmp_path / 'real'
+        real_dir.mkdir()
+        link_dir = tmp_path / 'link'
+        try:
+            link_dir.symlink_to(real_dir, target_is_directory=True)
+        except OSError:
+            pytest.skip('symlinks are not supported here')
+        ns = make_namespace(outfile=None, outdir=str(link_dir), stdout=False)
+        yaml_out_validator(mock_cmd, ns)
+        assert ns.outdir == real_dir.resolve()
+
 
 # -------------------------------------------------------
 # user_validator
 # -------------------------------------------------------
 
+_USER_ID_ARG = SimpleNamespace(type=SimpleNamespace(settings={'options_list': ['--user-id']}))
+
+
 class TestUserValidator:
     def test_empty_string_raises(self, mock_cmd):
         ns = make_namespace(user_id='')
         # Need to mock cmd.arguments for the error message
-        mock_cmd.arguments = {
-            'user_id': MagicMock(type=MagicMock(settings={'options_list': ['--user-id']}))
-        }
+        mock_cmd.arguments = {'user_id': _USER_ID_ARG}
         with pytest.raises(RequiredArgumentMissingError, match="--user-id"):
             user_validator(mock_cmd, ns)
 
@@ -207,6 +288,62 @@ class TestUserValidator:
         user_validator(mock_cmd, ns)  # should not raise
 
 
+# -------------------------------------------------------
+# _get_gallery_ids_by_name
+# -------------------------------------------------------
+
+_GALLERY_ID = '/subscriptions/{}/resourceGroups/{}/providers/Microsoft.Compute/galleries/{}'
+
+
+@pytest.fixture
+def gallery_lookup(monkeypatch):
+    """Empties the galleries cache and mocks the subscription, the gallery listing, and the clock."""
+    lookup = SimpleNamespace(subscription_id='sub1', now=1000.0, galleries={})
+    monkeypatch.setattr(_validators, '_galleries_cache', {})
+    monkeypatch.setattr('azure.cli.core.commands.client_factory.get_subscription_id',
+                        lambda cli_ctx: lookup.subscription_id)
+    lookup.list = MagicMock(side_effect=lambda cli_ctx, resource_type: lookup.galleries[lookup.subscription_id])
+    monkeypatch.setattr('azure.cli.core.commands.parameters.get_resources_in_subscription', lookup.list)
+    monkeypatch.setattr(_validators.time, 'monotonic', lambda: lookup.now)
+    return lookup
+
+
+def _gallery(sub, rg, name):
+    return SimpleNamespace(name=name, id=_GALLERY_ID.format(sub, rg, name))
+
+
+class TestGetGalleryIdsByName:
+    def test_hit_within_ttl(self, mock_cmd, gallery_lookup):
+        gallery_lookup.galleries['sub1'] = [_gallery('sub1', 'rg', 'MyGallery')]
+        first = _get_gallery_ids_by_name(mock_cmd.cli_ctx)
+        gallery_lookup.now += GALLERIES_CACHE_TTL - 1
+        assert _get_gallery_ids_by_name(mock_cmd.cli_ctx) is first
+        gallery_lookup.list.assert_called_once()
+
+    def test_refetch_after_ttl(self, mock_cmd, gallery_lookup):
+        gallery_lookup.galleries['sub1'] = [_gallery('sub1', 'rg', 'MyGallery')]
+        _get_gallery_ids_by_name(mock_cmd.cli_ctx)
+        gallery_lookup.galleries['sub1'] = [_gallery('sub1', 'rg', 'NewGallery')]
+        gallery_lookup.now += GALLERIES_CACHE_TTL
+        assert 'NewGallery' in _get_gallery_ids_by_name(mock_cmd.cli_ctx)
+        assert gallery_lookup.list.call_count == 2
+
+    def test_entries_per_subscription(self, mock_cmd, gallery_lookup):
+        gallery_lookup.galleries['sub1'] = [_gallery('sub1', 'rg', 'Gallery1')]
+        gallery_lookup.galleries['sub2'] = [_gallery('sub2', 'rg', 'Gallery2')]
+        assert list(_get_gallery_ids_by_name(mock_cmd.cli_ctx)) == ['Gallery1']
+        gallery_lookup.subscription_id = 'sub2'
+        assert list(_get_gallery_ids_by_name(mock_cmd.cli_ctx)) == ['Gallery2']
+        gallery_lookup.subscription_id = 'sub1'
+        assert list(_get_gallery_ids_by_name(mock_cmd.cli_ctx)) == ['Gallery1']
+        assert gallery_lookup.list.call_count == 2
+
+    def test_duplicate_names_first_match_wins(self, mock_cmd, gallery_lookup):
+        first, second = _gallery('sub1', 'rg1', 'MyGallery'), _gallery('sub1', 'rg2', 'MyGallery')
+        gallery_lookup.galleries['sub1'] = [first, second]
+        assert _get_gallery_ids_by_name(mock_cmd.cli_ctx) == {'MyGallery': first.id}
+
+
 # -------------------------------------------------------
 # Integration: process_bake_repo_validate_namespace
 # -------------------------------------------------------
@@ -215,8 +352,6 @@ class TestProcessBakeRepoValidateNamespace:
     """Integration test using a temporary repo directory structure."""
 
     def test_valid_repo(self, mock_cmd, tmp_repo):
-        from azext_bake._validators import process_bake_repo_validate_namespace
-
         ns = make_namespace(
             repository_path=str(tmp_repo),
             image_names=None,
@@ -233,8 +368,6 @@ class TestProcessBakeRepoValidateNamespace:
         assert len(ns.images) > 0
 
     def test_missing_images_dir(self, mock_cmd, tmp_path):
-        from azext_bake._validators import process_bake_repo_validate_namespace
-
         # Create .git but no images/
         git_dir = tmp_path / '.git'
         git_dir.mkdir()
@@ -254,8 +387,6 @@ class TestProcessBakeRepoValidateNamespace:
             process_bake_repo_validate_namespace(mock_cmd, ns)
 
     def test_missing_repo_path(self, mock_cmd):
-        from azext_bake._validators import process_bake_repo_validate_namespace
-
         ns = make_namespace(
             repository_path=None,
             image_names=None,
@@ -269,59 +400,49 @@ class TestProcessBakeRepoValidateNamespace:
 # Integration: process_sandbox_create_namespace
 # -------------------------------------------------------
 
+_SANDBOX_NS_DEFAULTS = {
+    'name_prefix': 'TestSandbox',
+    'sandbox_resource_group_name': None,
+    'vnet_address_prefix': '10.0.0.0/16',
+    'default_subnet_name': 'default',
+    'default_subnet_address_prefix': '10.0.0.0/24',
+    'builders_subnet_name': 'builders',
+    'builders_subnet_address_prefix': '10.0.1.0/24',
+    'tags': None,
+    'gallery_resource_id': None,
+    'version': None,
+    'prerelease': False,
+    'local_templates': False,
+    'templates_url': None,
+    'template_file': None,
+}
+
+
+@pytest.fixture
+def patched_validators(monkeypatch):
+    """Replaces the validators that call out to Azure or GitHub with mocks."""
+    mocks = SimpleNamespace(tags=MagicMock(), gallery=MagicMock(), templates=MagicMock())
+    monkeypatch.setattr('azext_bake._validators.validate_sandbox_tags', mocks.tags)
+    monkeypatch.setattr('azext_bake._validators.gallery_resource_id_validator', mocks.gallery)
+    monkeypatch.setattr('azext_bake._validators.templates_version_validator', mocks.templates)
+    return mocks
+
+
 class TestProcessSandboxCreateNamespace:
     """Tests for sandbox create validation with mocked external dependencies."""
 
-    @patch('azext_bake._validators.templates_version_validator')
-    @patch('azext_bake._validators.gallery_resource_id_validator')
-    @patch('azext_bake._validators.validate_sandbox_tags')
-    def test_valid_namespace(self, mock_tags, mock_gallery, mock_templates, mock_cmd):
-        from azext_bake._validators import process_sandbox_create_namespace
-
-        ns = make_namespace(
-            name_prefix='TestSandbox',
-            sandbox_resource_group_name=None,
-            vnet_address_prefix='10.0.0.0/16',
-            default_subnet_name='default',
-            default_subnet_address_prefix='10.0.0.0/24',
-            builders_subnet_name='builders',
-            builders_subnet_address_prefix='10.0.1.0/24',
-            tags=None,
-            gallery_resource_id=None,
-            version=None,
-            prerelease=False,
-            local_templates=False,
-            templates_url=None,
-            template_file=None,
-        )
+    def test_valid_namespace(self, mock_cmd, patched_validators):
+        ns = make_namespace(**_SANDBOX_NS_DEFAULTS)
 
         process_sandbox_create_namespace(mock_cmd, ns)
 
         # sandbox rg name should default to name_prefix
         assert ns.sandbox_resource_group_name == 'TestSandbox'
-        mock_templates.assert_called_once()
-        mock_gallery.assert_called_once()
+        patched_validators.templates.assert_called_once()
+        patched_validators.gallery.assert_called_once()
 
-    @patch('azext_bake._validators.templates_version_validator')
-    def test_empty_vnet_prefix_raises(self, mock_templates, mock_cmd):
-        from azext_bake._validators import process_sandbox_create_namespace
-
-        ns = make_namespace(
-            name_prefix='TestSandbox',
-            sandbox_resource_group_name='my-rg',
-            vnet_address_prefix='',
-            default_subnet_name='default',
-            default_subnet_address_prefix='10.0.0.0/24',
-            builders_subnet_name='builders',
-            builders_subnet_address_prefix='10.0.1.0/24',
-            tags=None,
-            gallery_resource_id=None,
-            version=None,
-            prerelease=False,
-            local_templates=False,
-            templates_url=None,
-            template_file=None,
-        )
+    def test_empty_vnet_prefix_raises(self, mock_cmd, patched_validators):
+        ns = make_namespace(**dict(_SANDBOX_NS_DEFAULTS, sandbox_resource_group_name='my-rg', vnet_address_prefix=''))
 
         with pytest.raises(InvalidArgumentValueError, match='vnet'):
             process_sandbox_create_namespace(mock_cmd, ns)